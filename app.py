@@ -1,8 +1,8 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import joblib
 import base64
+from sklearn import config_context
 
 # Set page config first
 st.set_page_config(
@@ -16,42 +16,51 @@ st.set_page_config(
 if 'dark_mode' not in st.session_state:
     st.session_state.dark_mode = False
 
-def toggle_theme():
-    st.session_state.dark_mode = not st.session_state.dark_mode
-
 # --- 2. Theme & CSS Logic ---
+@st.cache_data
 def get_base64_of_bin_file(bin_file):
+    # Cached: the background JPG is re-read and re-encoded otherwise
+    # on every rerun, which is O(file size) work per interaction.
     with open(bin_file, 'rb') as f:
         data = f.read()
     return base64.b64encode(data).decode()
 
-def load_css(is_dark):
-    # Define Colors based on mode
-    if is_dark:
-        # Dark Theme Palette
-        text_color = "#ecf0f1"
-        card_bg = "rgba(30, 40, 50, 0.90)" # Dark semi-transparent
-        overlay_color = "rgba(0, 0, 0, 0.75)" # Darker overlay
-        accent_color = "#00e5ff" # Neon Teal
-        button_bg = "#2980b9"
-        button_hover = "#3498db"
-        result_box_bg = "#2c3e50"
-    else:
-        # Light Theme Palette (Medical Clean)
-        text_color = "#2c3e50"
-        card_bg = "rgba(255, 255, 255, 0.95)" # White semi-transparent
-        overlay_color = "rgba(255, 255, 255, 0.5)" # Light overlay
-        accent_color = "#2c3e50" # Dark Blue
-        button_bg = "#4CAF50" # Medical Green
-        button_hover = "#45a049"
-        result_box_bg = "#2c3e50"
+def _build_css():
+    # Both palettes ship as CSS custom properties selected by a
+    # data-theme attribute on the document root, so flipping the theme
+    # never rebuilds or re-sends this block.
+    palette_css = """
+        /* Light Theme Palette (Medical Clean) */
+        :root {
+            --text-color: #2c3e50;
+            --card-bg: rgba(255, 255, 255, 0.95); /* White semi-transparent */
+            --overlay-color: rgba(255, 255, 255, 0.5); /* Light overlay */
+            --accent-color: #2c3e50; /* Dark Blue */
+            --button-bg: #4CAF50; /* Medical Green */
+            --button-hover: #45a049;
+            --result-box-bg: #2c3e50;
+            --fallback-bg: linear-gradient(135deg, #E0F7FA 0%, #80DEEA 100%);
+        }
+
+        /* Dark Theme Palette */
+        :root[data-theme="dark"] {
+            --text-color: #ecf0f1;
+            --card-bg: rgba(30, 40, 50, 0.90); /* Dark semi-transparent */
+            --overlay-color: rgba(0, 0, 0, 0.75); /* Darker overlay */
+            --accent-color: #00e5ff; /* Neon Teal */
+            --button-bg: #2980b9;
+            --button-hover: #3498db;
+            --result-box-bg: #2c3e50;
+            --fallback-bg: linear-gradient(135deg, #2c3e50 0%, #000000 100%);
+        }
+    """
 
     # Try to load background image
     bg_css = ""
     try:
         bin_str = get_base64_of_bin_file("medical-background.jpg")
         bg_css = f"""
-            background-image: linear-gradient({overlay_color}, {overlay_color}), url("data:image/jpg;base64,{bin_str}");
+            background-image: linear-gradient(var(--overlay-color), var(--overlay-color)), url("data:image/jpg;base64,{bin_str}");
             background-size: cover;
             background-position: center;
             background-repeat: no-repeat;
@@ -59,14 +68,15 @@ def load_css(is_dark):
         """
     except FileNotFoundError:
         # Fallback Gradient
-        scale = "linear-gradient(135deg, #2c3e50 0%, #000000 100%)" if is_dark else "linear-gradient(135deg, #E0F7FA 0%, #80DEEA 100%)"
-        bg_css = f"""
-            background: {scale};
+        bg_css = """
+            background: var(--fallback-bg);
             background-attachment: fixed;
         """
 
     return f"""
     <style>
+        {palette_css}
+
         /* Main App Background */
         .stApp {{
             {bg_css}
@@ -74,12 +84,12 @@ def load_css(is_dark):
         
         /* General Text Color */
         .stMarkdown, .stText, h1, h2, h3, label, .stSlider > div > div > div > div {{
-            color: {text_color} !important;
+            color: var(--text-color) !important;
         }}
         
         /* Card Containers */
         .css-1r6slb0, .css-12oz5g7, [data-testid="stForm"] {{
-            background-color: {card_bg};
+            background-color: var(--card-bg);
             padding: 2rem;
             border-radius: 15px;
             box-shadow: 0 10px 25px rgba(0,0,0,0.1);
@@ -105,7 +115,7 @@ def load_css(is_dark):
         /* Buttons */
         .stButton>button {{
             width: 100%;
-            background-color: {button_bg};
+            background-color: var(--button-bg);
             color: white !important;
             border: none;
             border-radius: 8px;
@@ -115,7 +125,7 @@ def load_css(is_dark):
         }}
         
         .stButton>button:hover {{
-            background-color: {button_hover};
+            background-color: var(--button-hover);
             transform: translateY(-2px);
             box-shadow: 0 5px 15px rgba(0,0,0,0.2);
         }}
@@ -144,14 +154,15 @@ def load_css(is_dark):
 
         /* Result Box */
         .result-box {{
-            background-color: {result_box_bg};
+            background-color: var(--result-box-bg);
             padding: 1.5rem;
             border-radius: 10px;
             text-align: center;
             margin-top: 2rem;
             animation: fadeIn 0.5s ease-in;
-            border: 1px solid {accent_color};
+            border: 1px solid var(--accent-color);
             box-shadow: 0 0 20px rgba(0,0,0,0.3);
+            scroll-margin-top: 1rem;
         }}
         
         .result-box h2 {{
@@ -174,8 +185,13 @@ def load_css(is_dark):
     </style>
     """
 
-# Inject CSS based on state
-st.markdown(load_css(st.session_state.dark_mode), unsafe_allow_html=True)
+@st.cache_resource
+def _get_css():
+    # Static: built once per process, valid for both themes.
+    return _build_css()
+
+# Inject CSS (theme selection happens in the browser via data-theme)
+st.markdown(_get_css(), unsafe_allow_html=True)
 
 # Load Models (Cached)
 @st.cache_resource
@@ -185,18 +201,88 @@ def load_artifacts():
     le_smoker = joblib.load("label_encoder_smoker.pkl")
     le_diabetic = joblib.load("label_encoder_diabetic.pkl")
     model = joblib.load("best_model.pkl")
-    return scaler, le_gender, le_smoker, le_diabetic, model
+    # Plain dict lookups are much cheaper than LabelEncoder.transform
+    # (which allocates an array and searchsorts classes_ per call).
+    gender_map = {c: i for i, c in enumerate(le_gender.classes_)}
+    smoker_map = {c: i for i, c in enumerate(le_smoker.classes_)}
+    diabetic_map = {c: i for i, c in enumerate(le_diabetic.classes_)}
+
+    # Partial-evaluate the fitted scaler down to its two vectors so the
+    # hot path is (x - mean) / scale with no sklearn dispatch. Kept in
+    # float64: scaler.transform standardizes in float64, and lower-
+    # precision constants can push a value across a tree split threshold.
+    mean = scaler.mean_
+    scale = scaler.scale_
+
+    # The model was fitted on a DataFrame; drop the recorded feature
+    # names so predicting on a bare ndarray row does not raise sklearn's
+    # feature-name UserWarning on every call.
+    if hasattr(model, "feature_names_in_"):
+        del model.feature_names_in_
+
+    # Specialize single-row inference once at load time instead of going
+    # through sklearn's generic predict pipeline on every request.
+    if hasattr(model, "coef_"):
+        coef = np.asarray(model.coef_, dtype=np.float32).ravel()
+        intercept = float(np.asarray(model.intercept_).ravel()[0])
+
+        def predict_fn(row):
+            return float(row[0] @ coef + intercept)
+    else:
+        def predict_fn(row, _predict=model.predict):
+            # Tree ensemble: at least skip the per-call finiteness check.
+            with config_context(assume_finite=True):
+                return float(_predict(row)[0])
+
+    return mean, scale, gender_map, smoker_map, diabetic_map, predict_fn
+
+@st.cache_data
+def predict_cached(age: int, bmi_tenths: int, children: int, bp: int, g: int, d: int, s: int) -> float:
+    # Keyed on the raw input tuple (BMI in tenths so the key stays an int);
+    # repeat submits with the same inputs skip preprocessing and inference.
+    mean, scale, _, _, _, predict_fn = load_artifacts()
+
+    # One preallocated row per session; fill it in place instead of
+    # allocating a fresh array (and intermediates) on every cache miss.
+    if "_scratch" not in st.session_state:
+        st.session_state["_scratch"] = np.empty((1, 7), dtype=np.float32)
+    row = st.session_state["_scratch"]
 
-import streamlit.components.v1 as components
+    # Column order the model was trained with:
+    # ["age", "gender", "bmi", "bloodpressure", "diabetic", "children", "smoker"]
+    row[0, 0] = (age - mean[0]) / scale[0]
+    row[0, 1] = g
+    row[0, 2] = (bmi_tenths / 10.0 - mean[1]) / scale[1]
+    row[0, 3] = (bp - mean[2]) / scale[2]
+    row[0, 4] = d
+    row[0, 5] = children
+    row[0, 6] = s
+    return predict_fn(row)
 
 def main():
     # Top Bar - Toggle
     col_t1, col_t2 = st.columns([4, 1])
     with col_t2:
-        st.toggle("Dark Mode", key="toggle_dark", value=st.session_state.dark_mode, on_change=toggle_theme)
+        st.toggle("Dark Mode", key="dark_mode")
+
+    # Flip the data-theme attribute (and remember it) only when the
+    # toggle actually changed; the CSS itself stays untouched.
+    theme = "dark" if st.session_state.dark_mode else "light"
+    if st.session_state.get("_applied_theme") != theme:
+        import streamlit.components.v1 as components
+        components.html(
+            f"""
+            <script>
+                window.parent.document.documentElement.dataset.theme = "{theme}";
+                window.parent.localStorage.setItem("theme", "{theme}");
+            </script>
+            """,
+            height=0
+        )
+        st.session_state["_applied_theme"] = theme
 
     try:
-        scaler, le_gender, le_smoker, le_diabetic, model = load_artifacts()
+        mean, scale, gender_map, smoker_map, diabetic_map, predict_fn = load_artifacts()
     except FileNotFoundError as e:
         st.error("Error loading models. Please check files.")
         return
@@ -209,49 +295,52 @@ def main():
         
         with col1:
             st.subheader("Personal Details")
-            age = st.slider("Age", 18, 100, 30)
-            gender = st.radio("Gender", options=le_gender.classes_, horizontal=True)
-            children = st.number_input("Children", 0, 10, 0)
+            st.slider("Age", 18, 100, 30, key="age")
+            st.radio("Gender", options=list(gender_map), horizontal=True, key="gender")
+            st.number_input("Children", 0, 10, 0, key="children")
             
         with col2:
             st.subheader("Health Metrics")
-            bmi = st.slider("BMI", 10.0, 60.0, 25.0, 0.1)
-            bloodpressure = st.slider("Blood Pressure", 60, 200, 120)
+            st.slider("BMI", 10.0, 60.0, 25.0, 0.1, key="bmi")
+            st.slider("Blood Pressure", 60, 200, 120, key="bloodpressure")
             
             st.subheader("Lifestyle")
             c1, c2 = st.columns(2)
             with c1:
-                smoker = st.selectbox("Smoker?", options=le_smoker.classes_)
+                st.selectbox("Smoker?", options=list(smoker_map), key="smoker")
             with c2:
-                diabetic = st.selectbox("Diabetic?", options=le_diabetic.classes_)
+                st.selectbox("Diabetic?", options=list(diabetic_map), key="diabetic")
 
         st.markdown("---")
         submitted = st.form_submit_button("Calculate Estimated Premium")
 
     if submitted:
-        input_dict = {
-            "age": [age], "bmi": [bmi], "children": [children],
-            "bloodpressure": [bloodpressure], "gender": [gender],
-            "diabetic": [diabetic], "smoker": [smoker]
-        }
-        input_df = pd.DataFrame(input_dict)
-
-        # Preprocessing (Same Robust Logic)
-        input_df["gender"] = le_gender.transform(input_df["gender"])
-        input_df["diabetic"] = le_diabetic.transform(input_df["diabetic"])
-        input_df["smoker"] = le_smoker.transform(input_df["smoker"])
-        
-        num_features = ["age", "bmi", "bloodpressure"]
-        input_df[num_features] = scaler.transform(input_df[num_features])
-        
-        for cat in ["gender", "diabetic", "smoker"]:
-            input_df[cat] = input_df[cat].astype(int)
-
-        model_cols = ["age", "gender", "bmi", "bloodpressure", "diabetic", "children", "smoker"]
-        final_input = input_df[model_cols]
+        # Keyed widgets live in session_state, so the submit path is a
+        # handful of state reads rather than captured locals.
+        age = st.session_state["age"]
+        bmi = st.session_state["bmi"]
+        children = st.session_state["children"]
+        bloodpressure = st.session_state["bloodpressure"]
+        gender = st.session_state["gender"]
+        diabetic = st.session_state["diabetic"]
+        smoker = st.session_state["smoker"]
 
+        # Short-circuit when the inputs match the previous submit, so a
+        # stale submitted=True (e.g. after an unrelated rerun) does not
+        # redo preprocessing and inference.
+        h = hash((age, bmi, children, bloodpressure, gender, diabetic, smoker))
         try:
-            prediction = model.predict(final_input)[0]
+            fresh_result = st.session_state.get("last_h") != h
+            if fresh_result:
+                prediction = predict_cached(
+                    age, int(round(bmi * 10)), children, bloodpressure,
+                    gender_map[gender], diabetic_map[diabetic], smoker_map[smoker]
+                )
+                st.session_state["last_h"] = h
+                st.session_state["last_result"] = prediction
+            else:
+                prediction = st.session_state["last_result"]
+
             st.markdown(f"""
             <div class="result-box" id="result_anchor">
                 <h2>Estimated Yearly Premium</h2>
@@ -259,17 +348,20 @@ def main():
                 <p>Based on your provided health profile.</p>
             </div>
             """, unsafe_allow_html=True)
-            
-            # Auto-scroll Logic
-            components.html(
-                """
-                <script>
-                    window.parent.document.querySelector('.result-box').scrollIntoView({behavior: 'smooth'});
-                </script>
-                """,
-                height=0
-            )
-            
+
+            # Auto-scroll only for a fresh result. This has to go through
+            # a components iframe: script tags in st.markdown HTML are
+            # inserted via React and never execute.
+            if fresh_result:
+                import streamlit.components.v1 as components
+                components.html(
+                    """
+                    <script>
+                        window.parent.document.querySelector('.result-box').scrollIntoView({behavior: 'smooth'});
+                    </script>
+                    """,
+                    height=0
+                )
         except Exception as e:
             st.error(f"Prediction Error: {e}")
 